@@ -4,6 +4,10 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import re
 import os
+import sqlite3
+from datetime import datetime, time as dt_time, timedelta
+
+from archive import AnalysisArchive
 
 # MUST BE FIRST: Configure the page
 st.set_page_config(
@@ -33,6 +37,18 @@ FEEDBACK_URL = os.getenv(
     "FEEDBACK_URL", "https://localhost:8000/api/v1/feedback"
 )
 
+# Optional local archive of past analyses, off unless ARCHIVE_PATH is set.
+# It is shared by every visitor, so only enable it on private deployments.
+# Oldest entries are pruned past ARCHIVE_MAX_MB; invalid or non-positive
+# values fall back to the default.
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH")
+try:
+    ARCHIVE_MAX_MB = float(os.getenv("ARCHIVE_MAX_MB", "500"))
+except ValueError:
+    ARCHIVE_MAX_MB = 500.0
+if not ARCHIVE_MAX_MB > 0:
+    ARCHIVE_MAX_MB = 500.0
+
 # Custom CSS for GPTZero-like styling with light theme override
 st.markdown(
     """
@@ -301,6 +317,73 @@ def create_probability_chart(sentences_data):
     return fig
 
 
+@st.cache_resource
+def get_archive():
+    """Open the analysis archive once and share it across sessions."""
+    return AnalysisArchive(ARCHIVE_PATH, int(ARCHIVE_MAX_MB * 1024 * 1024))
+
+
+def show_archive_sidebar():
+    """Sidebar to search past analyses and reopen them without the API."""
+    with st.sidebar:
+        st.markdown("### 🗂️ Analysis Archive")
+        try:
+            archive = get_archive()
+        except sqlite3.Error as e:
+            st.error(f"❌ Analysis archive is unavailable: {e}")
+            return
+
+        query = st.text_input(
+            "Search text", placeholder="Words from the analyzed text..."
+        )
+        date_range = st.date_input("Date range", value=(), format="YYYY-MM-DD")
+        prob_range = st.slider(
+            "AI probability", 0.0, 1.0, (0.0, 1.0), step=0.05, format="%.2f"
+        )
+
+        start = end = None
+        if len(date_range) >= 1:
+            start = datetime.combine(date_range[0], dt_time.min).timestamp()
+        if len(date_range) == 2:
+            end = datetime.combine(
+                date_range[1] + timedelta(days=1), dt_time.min
+            ).timestamp()
+
+        try:
+            matches = archive.search(
+                query=query,
+                start=start,
+                end=end,
+                min_probability=prob_range[0],
+                max_probability=prob_range[1],
+            )
+            stored = archive.count()
+        except sqlite3.Error as e:
+            st.error(f"❌ Archive search failed: {e}")
+            return
+
+        st.caption(f"{len(matches)} shown of {stored} stored analyses")
+        for match in matches:
+            created = datetime.fromtimestamp(match["created_at"])
+            label = (
+                f"{'🤖' if match['is_ai'] else '👤'} {match['ai_probability']:.1%} · "
+                f"{created:%Y-%m-%d %H:%M} · {match['preview'][:60]}"
+            )
+            if st.button(label, key=f"archive_open_{match['id']}"):
+                try:
+                    loaded = archive.load(match["id"])
+                except sqlite3.Error as e:
+                    st.error(f"❌ Could not open this analysis: {e}")
+                    continue
+                if loaded is None:
+                    st.warning("⚠️ This analysis has been removed from the archive.")
+                    continue
+                st.session_state.analyzed_text, st.session_state.analysis_result = (
+                    loaded
+                )
+                st.session_state.feedback_submitted = False
+
+
 def submit_feedback(
     text, prediction_result, feedback_type, failed_sentences=None, user_comment=None
 ):
@@ -455,6 +538,15 @@ if analyze_button:
                 st.error(f"❌ Error analyzing text: {e}")
                 st.stop()
 
+        if ARCHIVE_PATH:
+            try:
+                get_archive().save(text_input, result)
+            except sqlite3.Error as e:
+                st.warning(f"⚠️ Analysis could not be saved to the archive: {e}")
+
+if ARCHIVE_PATH:
+    show_archive_sidebar()
+
 # Display results if available (either from new analysis or session state)
 if st.session_state.analysis_result is not None:
     result = st.session_state.analysis_result
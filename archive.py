@@ -0,0 +1,434 @@
+import sqlite3
+import threading
+import time
+import json
+import zlib
+import re
+
+# Bump when the schema changes; _migrate upgrades older archives in place.
+SCHEMA_VERSION = 1
+
+# Deletes only append tombstones to the full-text index; it is rebuilt once
+# the text pruned since the last rebuild reaches this fraction of max_bytes.
+# The save that triggers a rebuild pays for it, in time proportional to the
+# size of the index.
+FTS_OPTIMIZE_FRACTION = 0.25
+
+# Below this many rows in the requested probability range, the probability
+# index is cheaper than walking the created_at index and filtering.
+NARROW_PROBABILITY_ROWS = 2000
+
+
+class AnalysisArchive:
+    """Local SQLite archive of past analyses with a full-text index.
+
+    max_bytes bounds the stored size of the analyses, with each text
+    weighted for its full-text index entries. The database file tracks it
+    roughly: tombstones awaiting the next index rebuild and the WAL file (up
+    to SQLite's autocheckpoint size, about 4 MB) come on top.
+    """
+
+    def __init__(self, path, max_bytes):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # auto_vacuum must be set before the first table is created
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            migrate = version < SCHEMA_VERSION and self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'analyses'"
+            ).fetchone()
+            if migrate:
+                self._migrate_v0()
+            self._conn.executescript(
+                """
+            CREATE TABLE IF NOT EXISTS analyses (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                ai_probability REAL NOT NULL,
+                is_ai INTEGER NOT NULL,
+                sentence_count INTEGER NOT NULL,
+                preview TEXT NOT NULL,
+                text TEXT NOT NULL,
+                result BLOB NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                probability_bucket TEXT GENERATED ALWAYS AS
+                    ('p' || CAST(ai_probability * 100 AS INTEGER)) VIRTUAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_analyses_created_at
+                ON analyses (created_at);
+            CREATE INDEX IF NOT EXISTS idx_analyses_ai_probability
+                ON analyses (ai_probability, created_at);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+                text, probability_bucket,
+                content='analyses', content_rowid='id', prefix='2 3 4'
+            );
+            CREATE TRIGGER IF NOT EXISTS analyses_ai AFTER INSERT ON analyses BEGIN
+                INSERT INTO analyses_fts (rowid, text, probability_bucket)
+                VALUES (new.id, new.text, new.probability_bucket);
+            END;
+            CREATE TRIGGER IF NOT EXISTS analyses_ad AFTER DELETE ON analyses BEGIN
+                INSERT INTO analyses_fts (analyses_fts, rowid, text, probability_bucket)
+                VALUES ('delete', old.id, old.text, old.probability_bucket);
+            END;
+
+            CREATE TABLE IF NOT EXISTS archive_stats (
+                total_bytes INTEGER NOT NULL,
+                pruned_bytes INTEGER NOT NULL
+            );
+            INSERT INTO archive_stats (total_bytes, pruned_bytes)
+                SELECT 0, 0 WHERE NOT EXISTS (SELECT 1 FROM archive_stats);
+            CREATE TRIGGER IF NOT EXISTS analyses_size_ai AFTER INSERT ON analyses
+            BEGIN
+                UPDATE archive_stats SET total_bytes = total_bytes + new.size;
+            END;
+            CREATE TRIGGER IF NOT EXISTS analyses_size_ad AFTER DELETE ON analyses
+            BEGIN
+                UPDATE archive_stats SET total_bytes = total_bytes - old.size,
+                    pruned_bytes = pruned_bytes + old.size;
+            END;
+            """
+            )
+            if migrate:
+                self._conn.execute(
+                    "INSERT INTO analyses_fts (analyses_fts) VALUES ('rebuild')"
+                )
+                self._conn.execute(
+                    "UPDATE archive_stats SET total_bytes = "
+                    "(SELECT IFNULL(SUM(size), 0) FROM analyses)"
+                )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            try:
+                # SQLite 3.42+ removes deleted rows from the index immediately
+                # instead of leaving tombstones for the next rebuild.
+                self._conn.execute(
+                    "INSERT INTO analyses_fts (analyses_fts, rank) "
+                    "VALUES ('secure-delete', 1)"
+                )
+            except sqlite3.OperationalError:
+                pass
+
+    def _migrate_v0(self):
+        """Bring an archive from before size tracking up to the current schema.
+
+        The old text-only index and its triggers are dropped; the schema
+        script then recreates them and the caller rebuilds the index. Each
+        step is skipped if already done, so an interrupted run can resume.
+        """
+        columns = {
+            row["name"]
+            for row in self._conn.execute("PRAGMA table_xinfo(analyses)")
+        }
+        self._conn.execute("DROP TRIGGER IF EXISTS analyses_ai")
+        self._conn.execute("DROP TRIGGER IF EXISTS analyses_ad")
+        self._conn.execute("DROP TABLE IF EXISTS analyses_fts")
+        if "size" not in columns:
+            self._conn.execute(
+                "ALTER TABLE analyses ADD COLUMN size INTEGER NOT NULL DEFAULT 0"
+            )
+        if "probability_bucket" not in columns:
+            self._conn.execute(
+                """
+                ALTER TABLE analyses ADD COLUMN probability_bucket TEXT
+                    GENERATED ALWAYS AS
+                    ('p' || CAST(ai_probability * 100 AS INTEGER)) VIRTUAL
+                """
+            )
+        self._conn.execute(
+            """
+            UPDATE analyses SET size = 3 * length(CAST(text AS BLOB))
+                + length(result) + length(CAST(preview AS BLOB))
+            """
+        )
+
+    @staticmethod
+    def _pack_result(text, result):
+        """Compress the API response, keeping only the fields the UI renders.
+
+        Sentences are stored as [start, end, probability, is_ai] offsets into
+        text; a sentence that can't be located is kept verbatim instead.
+        """
+        sentences = []
+        cursor = 0
+        for s in result.get("sentence_level_results") or []:
+            sentence = s["sentence"]
+            start = text.find(sentence, cursor)
+            if start == -1:
+                sentence = sentence.strip()
+                start = text.find(sentence, cursor) if sentence else -1
+            probability = round(s["ai_probability"], 4)
+            if start == -1:
+                sentences.append([s["sentence"], probability, int(s["is_ai"])])
+            else:
+                cursor = start + len(sentence)
+                sentences.append([start, cursor, probability, int(s["is_ai"])])
+
+        compact = {
+            "ai_probability": result.get("ai_probability", 0),
+            "is_ai": result.get("is_ai", False),
+            "is_humanized": result.get("is_humanized", False),
+            "humanizer_probability": result.get("humanizer_probability", 0),
+            "sentence_level_results": sentences,
+        }
+        return zlib.compress(json.dumps(compact, separators=(",", ":")).encode())
+
+    @staticmethod
+    def _unpack_result(text, blob):
+        compact = json.loads(zlib.decompress(blob))
+        sentences = []
+        for entry in compact["sentence_level_results"]:
+            if len(entry) == 4:
+                start, end, probability, is_ai = entry
+                sentence = text[start:end]
+            else:
+                sentence, probability, is_ai = entry
+            sentences.append(
+                {
+                    "sentence": sentence,
+                    "ai_probability": probability,
+                    "is_ai": bool(is_ai),
+                }
+            )
+        compact["sentence_level_results"] = sentences
+        return compact
+
+    def save(self, text, result):
+        """Store an analysis and apply retention. Returns the new row id."""
+        sentences = result.get("sentence_level_results") or []
+        preview = " ".join(text.split())[:120]
+        packed = self._pack_result(text, result)
+        # The text is weighted three times: once for the row, twice for its
+        # full-text index entries including the prefix indexes
+        size = 3 * len(text.encode()) + len(packed) + len(preview.encode())
+        with self._lock:
+            with self._conn:
+                # Keep created_at monotonic even if the wall clock steps back,
+                # since date filters on text searches rely on ids and
+                # timestamps growing together.
+                last = self._conn.execute(
+                    "SELECT MAX(created_at) FROM analyses"
+                ).fetchone()[0]
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO analyses (created_at, ai_probability, is_ai,
+                        sentence_count, preview, text, result, size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        max(time.time(), last or 0.0),
+                        float(result.get("ai_probability", 0)),
+                        int(bool(result.get("is_ai", False))),
+                        len(sentences),
+                        preview,
+                        text,
+                        packed,
+                        size,
+                    ),
+                )
+                pruned = self._enforce_retention(cursor.lastrowid)
+                if pruned:
+                    self._compact_index()
+            if pruned:
+                # executescript commits first, so this runs outside the insert
+                # transaction; a plain execute() would free only one page.
+                self._conn.executescript(
+                    "PRAGMA incremental_vacuum; PRAGMA wal_checkpoint(TRUNCATE);"
+                )
+        return cursor.lastrowid
+
+    def _compact_index(self):
+        """Rebuild the full-text index once enough tombstones have built up."""
+        pruned_bytes = self._conn.execute(
+            "SELECT pruned_bytes FROM archive_stats"
+        ).fetchone()[0]
+        if pruned_bytes < self.max_bytes * FTS_OPTIMIZE_FRACTION:
+            return
+        self._conn.execute(
+            "INSERT INTO analyses_fts (analyses_fts) VALUES ('optimize')"
+        )
+        self._conn.execute("UPDATE archive_stats SET pruned_bytes = 0")
+
+    def _enforce_retention(self, keep_id):
+        """Drop the oldest analyses until the stored total fits in max_bytes.
+
+        Rows are read oldest-first only until their sizes cover the
+        overshoot, and are then deleted in one statement. The row keep_id,
+        just saved, is never removed. Returns the number of rows deleted.
+        """
+        total = self._conn.execute(
+            "SELECT total_bytes FROM archive_stats"
+        ).fetchone()[0]
+        overshoot = total - self.max_bytes
+        if overshoot <= 0:
+            return 0
+        freed, last_id = 0, None
+        for row in self._conn.execute(
+            "SELECT id, size FROM analyses WHERE id < ? ORDER BY id", (keep_id,)
+        ):
+            freed += row["size"]
+            last_id = row["id"]
+            if freed >= overshoot:
+                break
+        if last_id is None:
+            return 0
+        return self._conn.execute(
+            "DELETE FROM analyses WHERE id <= ?", (last_id,)
+        ).rowcount
+
+    @staticmethod
+    def _fts_query(query):
+        """Turn free text into an FTS5 query; only the last term is a prefix.
+
+        Terms are restricted to the text column so they can't hit the
+        probability buckets. One-character terms are matched exactly, as they
+        have no prefix index.
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return ""
+        quoted = [f'"{term}"' for term in terms]
+        if len(terms[-1]) > 1:
+            quoted[-1] += "*"
+        return f"text : ({' '.join(quoted)})"
+
+    @staticmethod
+    def _bucket_query(min_probability, max_probability):
+        """FTS5 query for the 1% probability buckets covering a range."""
+        buckets = range(int(min_probability * 100), int(max_probability * 100) + 1)
+        return f"probability_bucket : ({' OR '.join(f'p{b}' for b in buckets)})"
+
+    def _id_bounds(self, start, end):
+        """Map a created_at range onto an id range, or None if it is empty.
+
+        save() keeps created_at monotonic, so ids grow with it and each
+        bound is one seek on its index.
+        """
+        low, high = 0, 2**63 - 1
+        if start is not None:
+            row = self._conn.execute(
+                "SELECT id FROM analyses WHERE created_at >= ? "
+                "ORDER BY created_at LIMIT 1",
+                (start,),
+            ).fetchone()
+            if row is None:
+                return None
+            low = row[0]
+        if end is not None:
+            row = self._conn.execute(
+                "SELECT id FROM analyses WHERE created_at < ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (end,),
+            ).fetchone()
+            if row is None:
+                return None
+            high = row[0]
+        return low, high
+
+    def _is_narrow_probability_range(self, min_probability, max_probability):
+        rows = self._conn.execute(
+            """
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM analyses WHERE ai_probability BETWEEN ? AND ? LIMIT ?
+            )
+            """,
+            (min_probability, max_probability, NARROW_PROBABILITY_ROWS),
+        ).fetchone()[0]
+        return rows < NARROW_PROBABILITY_ROWS
+
+    def search(
+        self,
+        query="",
+        start=None,
+        end=None,
+        min_probability=0.0,
+        max_probability=1.0,
+        limit=50,
+    ):
+        """Find analyses by content, timestamp range and AI probability range."""
+        with self._lock:
+            return self._search(
+                query, start, end, min_probability, max_probability, limit
+            )
+
+    def _search(self, query, start, end, min_probability, max_probability, limit):
+        clauses, params = [], []
+        fts_query = self._fts_query(query)
+        narrowed = min_probability > 0.0 or max_probability < 1.0
+        narrow = narrowed and self._is_narrow_probability_range(
+            min_probability, max_probability
+        )
+
+        if narrowed:
+            # Results are returned newest-first, so walking the created_at
+            # index (or the FTS rowids) and filtering beats reading the whole
+            # probability range and sorting it. The unary + keeps the planner
+            # off the probability index unless the range holds only a few rows.
+            use_index = narrow and not fts_query
+            column = "a.ai_probability" if use_index else "+a.ai_probability"
+            clauses.append(f"{column} BETWEEN ? AND ?")
+            params += [min_probability, max_probability]
+
+        if fts_query:
+            if narrow:
+                # Few rows are in range, so let FTS5 intersect the text
+                # matches with the range's probability buckets rather than
+                # walking every text match to test its probability.
+                fts_query += " AND " + self._bucket_query(
+                    min_probability, max_probability
+                )
+            # The date range becomes an FTS rowid range so FTS5 seeks to it,
+            # and ordering on the rowid walks matches newest-first.
+            if start is not None or end is not None:
+                bounds = self._id_bounds(start, end)
+                if bounds is None:
+                    return []
+                clauses.append("analyses_fts.rowid BETWEEN ? AND ?")
+                params += list(bounds)
+            source = "analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid"
+            clauses.append("analyses_fts MATCH ?")
+            params.append(fts_query)
+            order = "analyses_fts.rowid DESC"
+        else:
+            if start is not None:
+                clauses.append("a.created_at >= ?")
+                params.append(start)
+            if end is not None:
+                clauses.append("a.created_at < ?")
+                params.append(end)
+            source = "analyses a"
+            order = "a.created_at DESC"
+
+        sql = f"""
+            SELECT a.id, a.created_at, a.ai_probability, a.is_ai,
+                a.sentence_count, a.preview
+            FROM {source}
+            WHERE {" AND ".join(clauses) or "1"}
+            ORDER BY {order}
+            LIMIT ?
+        """
+        params.append(limit)
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def load(self, analysis_id):
+        """Return (text, result) for a stored analysis, or None if pruned."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, result FROM analyses WHERE id = ?", (analysis_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row["text"], self._unpack_result(row["text"], row["result"])
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
@@ -0,0 +1,143 @@
+import random
+import re
+
+import pytest
+
+import archive as archive_module
+from archive import AnalysisArchive
+
+WORDS = "alpha beta gamma delta coffee barista landscape paradigm weekend".split()
+
+
+def make_result(text_sentences, probability):
+    return {
+        "ai_probability": probability,
+        "is_ai": probability >= 0.5,
+        "sentence_level_results": [
+            {"sentence": s, "ai_probability": probability, "is_ai": probability >= 0.5}
+            for s in text_sentences
+        ],
+    }
+
+
+def save_random(archive, rng, probability=None):
+    sentences = [
+        " ".join(rng.choices(WORDS, k=rng.randint(5, 20))) + "."
+        for _ in range(rng.randint(2, 8))
+    ]
+    if probability is None:
+        probability = rng.random()
+    return archive.save(" ".join(sentences), make_result(sentences, probability))
+
+
+@pytest.fixture
+def rng():
+    return random.Random(0)
+
+
+def test_rejects_non_positive_limit(tmp_path):
+    for max_bytes in (0, -1):
+        with pytest.raises(ValueError):
+            AnalysisArchive(str(tmp_path / "archive.db"), max_bytes)
+
+
+def test_retention_keeps_most_rows_past_the_cap(tmp_path, rng):
+    archive = AnalysisArchive(str(tmp_path / "archive.db"), 200 * 1024)
+    counts = []
+    for _ in range(3000):
+        save_random(archive, rng)
+        counts.append(archive.count())
+
+    steady = counts[len(counts) // 2 :]
+    # Each save should drop only a handful of the oldest rows, never wipe them
+    assert min(steady) > 0.8 * max(steady)
+    assert max(
+        before + 1 - after for before, after in zip(counts, counts[1:])
+    ) < 10
+    total = archive._conn.execute("SELECT total_bytes FROM archive_stats").fetchone()
+    assert total[0] <= archive.max_bytes
+    # Raises if pruning and index rebuilds have left the FTS index corrupt
+    archive._conn.execute(
+        "INSERT INTO analyses_fts (analyses_fts) VALUES ('integrity-check')"
+    )
+
+
+def test_load_round_trips_sentences(tmp_path):
+    archive = AnalysisArchive(str(tmp_path / "archive.db"), 1024 * 1024)
+    text = "First sentence here.  Second one follows."
+    result = {
+        "ai_probability": 0.8,
+        "is_ai": True,
+        "is_humanized": False,
+        "humanizer_probability": 0.1,
+        "sentence_level_results": [
+            {"sentence": "First sentence here.", "ai_probability": 0.9, "is_ai": 1},
+            {"sentence": " Second one follows. ", "ai_probability": 0.2, "is_ai": 0},
+            {"sentence": "Not in the text.", "ai_probability": 0.6, "is_ai": 1},
+        ],
+    }
+    loaded_text, loaded = archive.load(archive.save(text, result))
+
+    assert loaded_text == text
+    assert [s["sentence"] for s in loaded["sentence_level_results"]] == [
+        "First sentence here.",
+        "Second one follows.",
+        "Not in the text.",
+    ]
+    assert [s["ai_probability"] for s in loaded["sentence_level_results"]] == [
+        0.9,
+        0.2,
+        0.6,
+    ]
+    assert loaded["ai_probability"] == 0.8
+    assert archive.load(12345) is None
+
+
+@pytest.mark.parametrize("narrow_rows", [0, archive_module.NARROW_PROBABILITY_ROWS])
+def test_search_matches_brute_force(tmp_path, rng, monkeypatch, narrow_rows):
+    # A threshold of 0 forces the plan for wide probability ranges
+    monkeypatch.setattr(archive_module, "NARROW_PROBABILITY_ROWS", narrow_rows)
+    archive = AnalysisArchive(str(tmp_path / "archive.db"), 100 * 1024 * 1024)
+    for _ in range(500):
+        save_random(archive, rng)
+    rows = archive._conn.execute(
+        "SELECT id, ai_probability, text FROM analyses"
+    ).fetchall()
+
+    for query, low, high in [
+        ("coffee", 0.0, 1.0),
+        ("coffee", 0.5, 0.52),
+        ("barista land", 0.3, 0.9),
+        ("", 0.95, 1.0),
+        ("p50", 0.0, 1.0),
+    ]:
+        words = query.split()
+        expected = []
+        for row in rows:
+            tokens = re.findall(r"\w+", row["text"])
+            if not low <= row["ai_probability"] <= high:
+                continue
+            if not all(w in tokens for w in words[:-1]):
+                continue
+            if words and not any(t.startswith(words[-1]) for t in tokens):
+                continue
+            expected.append(row["id"])
+        found = archive.search(
+            query, min_probability=low, max_probability=high, limit=1000
+        )
+        assert {r["id"] for r in found} == set(expected)
+        created = [r["created_at"] for r in found]
+        assert created == sorted(created, reverse=True)
+
+
+def test_date_filter_survives_clock_stepping_back(tmp_path, monkeypatch):
+    archive = AnalysisArchive(str(tmp_path / "archive.db"), 1024 * 1024)
+    clock = iter([1000.0, 2000.0, 1500.0, 3000.0])
+    monkeypatch.setattr(archive_module.time, "time", lambda: next(clock))
+    ids = [
+        archive.save("Coffee break.", make_result(["Coffee break."], 0.5))
+        for _ in range(4)
+    ]
+
+    assert {r["id"] for r in archive.search("coffee", start=1800)} == set(ids[1:])
+    assert {r["id"] for r in archive.search("coffee", end=1800)} == {ids[0]}